@@ -0,0 +1,693 @@
+import operator
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from stimpl.expression import (
+    Expr, Program, Sequence, Assign, Variable, Ren, Print,
+    Literal, IntLiteral, FloatingPointLiteral, StringLiteral, BooleanLiteral,
+    BinaryOperator, Add, Subtract, Multiply, Divide,
+    And, Or, Not,
+    Lt, Lte, Gt, Gte, Eq, Ne,
+    If, While, ExpressionTable
+)
+from stimpl.types import Integer, FloatingPoint, String, Boolean, Type, INT, FLOAT, STR, BOOL, UNIT
+from stimpl.errors import InterpMathError
+
+"""
+Opcodes
+
+An instruction is an (opcode, argument) pair. Every compiled expression
+leaves exactly one value on the operand stack.
+
+The *_INT/*_FLOAT/*_STR/*_BOOL and *_TYPED opcodes are emitted only when the
+compiler has proven the operand types, so they skip the runtime checks.
+
+Variables are referred to by slot: the index of the variable's name in the
+compiled code's variable_names.
+"""
+
+OP_CONST = 0
+OP_POP = 1
+OP_LOAD_VAR = 2
+OP_STORE_VAR = 3
+OP_PRINT = 4
+OP_ADD = 5
+OP_SUB = 6
+OP_MUL = 7
+OP_DIV = 8
+OP_AND = 9
+OP_OR = 10
+OP_NOT = 11
+OP_LT = 12
+OP_LTE = 13
+OP_GT = 14
+OP_GTE = 15
+OP_EQ = 16
+OP_NE = 17
+OP_JUMP = 18
+OP_JUMP_IF_FALSE = 19
+OP_ADD_INT = 20
+OP_ADD_FLOAT = 21
+OP_ADD_STR = 22
+OP_SUB_INT = 23
+OP_SUB_FLOAT = 24
+OP_MUL_INT = 25
+OP_MUL_FLOAT = 26
+OP_DIV_INT = 27
+OP_DIV_FLOAT = 28
+OP_LT_TYPED = 29
+OP_LTE_TYPED = 30
+OP_GT_TYPED = 31
+OP_GTE_TYPED = 32
+OP_EQ_TYPED = 33
+OP_NE_TYPED = 34
+OP_LOOP = 35
+OP_NATIVE_LOOP = 36
+OP_STORE_VAR_TYPED = 37
+OP_STORE_VAR_POP = 38
+OP_STORE_VAR_TYPED_POP = 39
+OP_JUMP_IF_FALSE_OR_POP = 40
+OP_NOT_BOOL = 41
+OP_AND_BOOL = 42
+OP_OR_BOOL = 43
+OP_JUMP_IF_FALSE_BOOL = 44
+OP_JUMP_IF_TRUE_OR_POP = 45
+OP_UNHANDLED = 46
+
+NUM_OPCODES = 47
+
+Instruction = Tuple[int, Any]
+
+
+class Code(object):
+    """
+    A compiled program: its instructions and the names of the variables
+    that its instructions refer to by slot.
+
+    The program runs until it reaches the instruction at end. Loops that
+    are specialized while the program runs are appended after it.
+    """
+    __slots__ = ('instructions', 'variable_names', 'end')
+
+    def __init__(self, instructions: List[Instruction], variable_names: Tuple[str, ...]):
+        self.instructions = instructions
+        self.variable_names = variable_names
+        self.end = len(instructions)
+
+
+# The number of iterations after which a loop is specialized for the types
+# its variables have at that point.
+HOT_LOOP_THRESHOLD = 50
+
+
+class LoopSite(object):
+    """
+    The back-edge of a While loop (the argument of its LOOP instruction).
+
+    It counts the iterations of the loop and remembers where the versions
+    of the loop specialized for each combination of variable types start.
+    A site whose versions is None is never specialized.
+    """
+    __slots__ = ('loop', 'body_start', 'exit', 'check_condition', 'count', 'versions')
+
+    def __init__(self, loop: While, body_start: int, check_condition: bool):
+        self.loop = loop
+        self.body_start = body_start
+        self.exit: int = 0
+        self.check_condition = check_condition
+        self.count = 0
+        self.versions: Optional[Dict[Tuple[type, ...], int]] = {}
+
+
+_BINARY_OPCODES: Dict[type, int] = {
+    Add: OP_ADD,
+    Subtract: OP_SUB,
+    Multiply: OP_MUL,
+    Divide: OP_DIV,
+    And: OP_AND,
+    Or: OP_OR,
+    Lt: OP_LT,
+    Lte: OP_LTE,
+    Gt: OP_GT,
+    Gte: OP_GTE,
+    Eq: OP_EQ,
+    Ne: OP_NE,
+}
+
+_LITERAL_TYPES = {
+    Ren: UNIT,
+    IntLiteral: INT,
+    FloatingPointLiteral: FLOAT,
+    StringLiteral: STR,
+    BooleanLiteral: BOOL,
+}
+
+# The operations performed by the typed opcodes, used to fold them when
+# both operands are constants.
+_CONSTANT_FOLDERS: Dict[int, Callable[[Any, Any], Any]] = {
+    OP_ADD_INT: operator.add,
+    OP_ADD_FLOAT: operator.add,
+    OP_ADD_STR: operator.add,
+    OP_SUB_INT: operator.sub,
+    OP_SUB_FLOAT: operator.sub,
+    OP_MUL_INT: operator.mul,
+    OP_MUL_FLOAT: operator.mul,
+    OP_DIV_INT: operator.floordiv,
+    OP_DIV_FLOAT: operator.truediv,
+    OP_AND_BOOL: lambda l_val, r_val: l_val and r_val,
+    OP_OR_BOOL: lambda l_val, r_val: l_val or r_val,
+    OP_LT_TYPED: operator.lt,
+    OP_LTE_TYPED: operator.le,
+    OP_GT_TYPED: operator.gt,
+    OP_GTE_TYPED: operator.ge,
+    OP_EQ_TYPED: operator.eq,
+    OP_NE_TYPED: operator.ne,
+}
+
+# Opcodes whose argument is the target of a jump.
+_JUMP_OPCODES = frozenset((
+    OP_JUMP, OP_JUMP_IF_FALSE, OP_JUMP_IF_FALSE_BOOL,
+    OP_JUMP_IF_FALSE_OR_POP, OP_JUMP_IF_TRUE_OR_POP,
+))
+
+# Opcodes whose argument is a variable name, until slots are resolved.
+_VARIABLE_OPCODES = frozenset((
+    OP_LOAD_VAR, OP_STORE_VAR, OP_STORE_VAR_TYPED,
+    OP_STORE_VAR_POP, OP_STORE_VAR_TYPED_POP,
+))
+
+# Stores that also discard the assigned value, used for assignments whose
+# value is never read.
+_DISCARDING_STORES = {
+    OP_STORE_VAR: OP_STORE_VAR_POP,
+    OP_STORE_VAR_TYPED: OP_STORE_VAR_TYPED_POP,
+}
+
+_TYPED_OPCODES: Dict[Tuple[type, type], int] = {
+    (Add, Integer): OP_ADD_INT,
+    (Add, FloatingPoint): OP_ADD_FLOAT,
+    (Add, String): OP_ADD_STR,
+    (Subtract, Integer): OP_SUB_INT,
+    (Subtract, FloatingPoint): OP_SUB_FLOAT,
+    (Multiply, Integer): OP_MUL_INT,
+    (Multiply, FloatingPoint): OP_MUL_FLOAT,
+    (Divide, Integer): OP_DIV_INT,
+    (Divide, FloatingPoint): OP_DIV_FLOAT,
+    (And, Boolean): OP_AND_BOOL,
+    (Or, Boolean): OP_OR_BOOL,
+}
+
+_COMPARISON_OPCODES: Dict[type, int] = {
+    Lt: OP_LT_TYPED,
+    Lte: OP_LTE_TYPED,
+    Gt: OP_GT_TYPED,
+    Gte: OP_GTE_TYPED,
+    Eq: OP_EQ_TYPED,
+    Ne: OP_NE_TYPED,
+}
+
+"""
+Compilation.
+
+While compiling, the compiler tracks the types of the variables that are
+definitely assigned at each point of the program. Because a variable's type
+can never change after its first assignment, any type recorded here holds
+for the rest of the program.
+"""
+
+
+def compile_expr(expression: Expr) -> Code:
+    instructions: List[Instruction] = []
+    _COMPILERS[type(expression)](expression, instructions, {})
+    return Code(instructions, _resolve_slots(instructions, {}))
+
+
+def specialize_loop(code: Code, site: LoopSite, types: Dict[str, Type]) -> int:
+    """
+    Compile another version of the loop at site, given the types of the
+    variables that are bound when it runs, append it to code and return the
+    position to continue from, with the loop's condition just found true.
+
+    A variable's type never changes once it is bound, so the new version
+    stays valid for the rest of the run without any guards.
+    """
+    instructions: List[Instruction] = []
+    _compile_while(site.loop, instructions, types)
+    _resolve_slots(instructions, {variable_name: slot for slot, variable_name in enumerate(code.variable_names)})
+    if len(code.instructions) == code.end:
+        # Keep the first version from starting at end.
+        code.instructions.append((OP_JUMP, code.end))
+    base = len(code.instructions)
+    for pc, (op, arg) in enumerate(instructions):
+        if op in _JUMP_OPCODES:
+            instructions[pc] = (op, arg + base)
+        elif op == OP_LOOP:
+            arg.body_start += base
+            arg.exit += base
+    # Unless it compiled to a native loop, the new version starts with the
+    # jump to its condition and ends with its back-edge and result.
+    top_site = instructions[-2][1] if instructions[0][0] == OP_JUMP else None
+    if top_site is not None:
+        # Already as specialized as it gets.
+        top_site.versions = None
+    code.instructions.extend(instructions)
+    code.instructions.append((OP_JUMP, site.exit))
+    # The condition was already evaluated: enter the new version at its
+    # body. A native loop evaluates nothing but its (pure) condition before
+    # the body, so it can simply be entered at the start.
+    return top_site.body_start if top_site is not None else base
+
+
+def _resolve_slots(code: List[Instruction], slots: Dict[str, int]) -> Tuple[str, ...]:
+    # Replace variable names with slots, allocating new slots in order of
+    # first appearance, and return the names in slot order.
+    for pc, (op, arg) in enumerate(code):
+        if op in _VARIABLE_OPCODES:
+            code[pc] = (op, slots.setdefault(arg, len(slots)))
+        elif op == OP_NATIVE_LOOP:
+            loop, variable_names = arg
+            code[pc] = (op, (loop, tuple(slots.setdefault(name, len(slots)) for name in variable_names)))
+    return tuple(slots)
+
+
+def _literal_compiler(typ: Type):
+    def _compile_literal(expression: Literal, code: List[Instruction], types: Dict[str, Type]) -> Type:
+        code.append((OP_CONST, expression.literal))
+        return typ
+    return _compile_literal
+
+
+def _compile_ren(expression: Ren, code: List[Instruction], types: Dict[str, Type]) -> Type:
+    code.append((OP_CONST, None))
+    return UNIT
+
+
+def _compile_unhandled(expression: Any, code: List[Instruction], types: Dict[str, Type]) -> None:
+    # As in evaluate, an expression of an unknown type is an error only if
+    # the program actually reaches it.
+    code.append((OP_UNHANDLED, None))
+    return None
+
+
+def _compile_print(expression: Print, code: List[Instruction], types: Dict[str, Type]) -> Optional[Type]:
+    to_print = expression.to_print
+    typ = _COMPILERS[type(to_print)](to_print, code, types)
+    code.append((OP_PRINT, None))
+    return typ
+
+
+def _compile_sequence(expression: Sequence, code: List[Instruction], types: Dict[str, Type]) -> Optional[Type]:
+    last = _compile_sequence_head(expression, code, types)
+    return _COMPILERS[type(last)](last, code, types)
+
+
+_EMPTY_SEQUENCE_RESULT = Ren()
+
+
+def _compile_sequence_head(expression: Union[Sequence, Program], code: List[Instruction], types: Dict[str, Type]) -> Expr:
+    # Compile all but the last expression of a sequence and return the last
+    # one. An empty sequence evaluates to Unit, just like a Ren.
+    exprs = expression.exprs
+    if len(exprs) == 0:
+        return _EMPTY_SEQUENCE_RESULT
+    exprs = _flatten_sequence(exprs)
+    for expr in exprs[:-1]:
+        _compile_discarded(expr, code, types)
+    return exprs[-1]
+
+
+def _compile_variable(expression: Variable, code: List[Instruction], types: Dict[str, Type]) -> Optional[Type]:
+    code.append((OP_LOAD_VAR, expression.variable_name))
+    return types.get(expression.variable_name)
+
+
+def _compile_assign(expression: Assign, code: List[Instruction], types: Dict[str, Type]) -> Optional[Type]:
+    variable_name = expression.variable.variable_name
+    value = expression.value
+    value_type = _COMPILERS[type(value)](value, code, types)
+    variable_type = types.get(variable_name)
+    if variable_type is not None and variable_type is value_type:
+        code.append((OP_STORE_VAR_TYPED, variable_name))
+        return variable_type
+    code.append((OP_STORE_VAR, variable_name))
+    # A successful assignment always leaves the variable with the
+    # type that it had before (if any).
+    variable_type = variable_type or value_type
+    if variable_type is not None:
+        types[variable_name] = variable_type
+    return variable_type
+
+
+def _compile_not(expression: Not, code: List[Instruction], types: Dict[str, Type]) -> Type:
+    expr_start = len(code)
+    expr = expression.expr
+    typ = _COMPILERS[type(expr)](expr, code, types)
+    if typ is BOOL and len(code) == expr_start + 1 and code[-1][0] == OP_CONST:
+        code[-1] = (OP_CONST, not code[-1][1])
+        return BOOL
+    code.append((OP_NOT_BOOL if typ is BOOL else OP_NOT, None))
+    return BOOL
+
+
+class _PendingIf(object):
+    # An If whose branches are being compiled.
+    __slots__ = ('expression', 'types', 'jump', 'jump_to_false', 'jump_to_end', 'true_types', 'true_type')
+
+    def __init__(self, expression: If, types: Dict[str, Type], jump: int, jump_to_false: int):
+        self.expression = expression
+        self.types = types
+        self.jump = jump
+        self.jump_to_false = jump_to_false
+        self.jump_to_end: int = 0
+        self.true_types: Optional[Dict[str, Type]] = None
+        self.true_type: Optional[Type] = None
+
+
+def _compile_if(expression: If, code: List[Instruction], types: Dict[str, Type]) -> Optional[Type]:
+    # The Ifs and sequences in tail position (the branches of an If and the
+    # last expression of a sequence) are compiled in this loop rather than
+    # recursively, so long chains of them are not limited by Python's
+    # recursion limit.
+    pending: List[_PendingIf] = []
+    tail: Expr = expression
+    while True:
+        while True:
+            if isinstance(tail, (Sequence, Program)):
+                tail = _compile_sequence_head(tail, code, types)
+            elif isinstance(tail, If):
+                condition = tail.condition
+                condition_start = len(code)
+                condition_type = _COMPILERS[type(condition)](condition, code, types)
+                if condition_type is BOOL and len(code) == condition_start + 1 and code[-1][0] == OP_CONST:
+                    # Only one branch can ever run, and it definitely runs.
+                    tail = tail.true if code.pop()[1] else tail.false
+                    continue
+                jump = OP_JUMP_IF_FALSE_BOOL if condition_type is BOOL else OP_JUMP_IF_FALSE
+                pending.append(_PendingIf(tail, types, jump, len(code)))
+                code.append((jump, None))
+                types = dict(types)
+                tail = tail.true
+            else:
+                result_type: Optional[Type] = _COMPILERS[type(tail)](tail, code, types)
+                break
+        while pending:
+            pending_if = pending[-1]
+            if pending_if.true_types is None:
+                # The true branch is done: go on with the false branch.
+                pending_if.true_types = types
+                pending_if.true_type = result_type
+                pending_if.jump_to_end = len(code)
+                code.append((OP_JUMP, None))
+                code[pending_if.jump_to_false] = (pending_if.jump, len(code))
+                types = dict(pending_if.types)
+                tail = pending_if.expression.false
+                break
+            pending.pop()
+            code[pending_if.jump_to_end] = (OP_JUMP, len(code))
+            false_types = types
+            types = pending_if.types
+            # Only variables assigned (with the same type) along both
+            # branches are definitely assigned after the If.
+            for variable_name, variable_type in pending_if.true_types.items():
+                if false_types.get(variable_name) is variable_type:
+                    types[variable_name] = variable_type
+            result_type = pending_if.true_type if pending_if.true_type is result_type else None
+        else:
+            return result_type
+
+
+def _compile_while(expression: While, code: List[Instruction], types: Dict[str, Type]) -> Type:
+    condition = expression.condition
+    compile_condition = _COMPILERS[type(condition)]
+    if _pure_type(condition, types) is BOOL:
+        condition_code: List[Instruction] = []
+        compile_condition(condition, condition_code, dict(types))
+        if condition_code == [(OP_CONST, False)]:
+            # The body never runs.
+            code.append((OP_CONST, False))
+            return BOOL
+    native_loop = _try_compile_loop(expression, types)
+    if native_loop is not None:
+        code.append((OP_NATIVE_LOOP, native_loop))
+        return BOOL
+    # The condition is placed after the body so that each iteration
+    # only runs a single (conditional) jump back to the body.
+    jump_to_condition = len(code)
+    code.append((OP_JUMP, None))
+    body_start = len(code)
+    # The body may never run, so its assignments are not visible
+    # after the loop. It is emitted ahead of the condition, so it
+    # (conservatively) only sees the types known before the loop.
+    _compile_discarded(expression.body, code, dict(types))
+    code[jump_to_condition] = (OP_JUMP, len(code))
+    site = LoopSite(expression, body_start, compile_condition(condition, code, types) is not BOOL)
+    code.append((OP_LOOP, site))
+    code.append((OP_CONST, False))
+    site.exit = len(code)
+    return BOOL
+
+
+def _binary_compiler(node_type: type):
+    def _compile_binary(expression: BinaryOperator, code: List[Instruction], types: Dict[str, Type]) -> Optional[Type]:
+        left = expression.left
+        right = expression.right
+        compile_right = _COMPILERS[type(right)]
+        left_start = len(code)
+        l_type = _COMPILERS[type(left)](left, code, types)
+        if node_type in (And, Or) and l_type is BOOL and _pure_type(right, types) is BOOL:
+            if len(code) == left_start + 1 and code[-1][0] == OP_CONST:
+                # The left operand alone decides the result, or the
+                # result is the right operand.
+                if bool(code[-1][1]) is (node_type is Or):
+                    return BOOL
+                del code[-1]
+                return compile_right(right, code, types)
+            # STIMPL has no short-circuit evaluation, but when the right
+            # operand can neither raise, assign nor print, skipping it is
+            # indistinguishable from evaluating it.
+            jump = OP_JUMP_IF_FALSE_OR_POP if node_type is And else OP_JUMP_IF_TRUE_OR_POP
+            jump_to_end = len(code)
+            code.append((jump, None))
+            compile_right(right, code, types)
+            code[jump_to_end] = (jump, len(code))
+            return BOOL
+        r_type = compile_right(right, code, types)
+        if l_type is not None and l_type is r_type:
+            if (node_type, type(l_type)) in _TYPED_OPCODES:
+                _emit_typed(_TYPED_OPCODES[(node_type, type(l_type))], code, left_start)
+                return l_type
+            if node_type in _COMPARISON_OPCODES and l_type is not UNIT:
+                _emit_typed(_COMPARISON_OPCODES[node_type], code, left_start)
+                return BOOL
+        code.append((_BINARY_OPCODES[node_type], None))
+        if node_type in _COMPARISON_OPCODES or node_type in (And, Or):
+            return BOOL
+        # When the generic operator succeeds, both operands had the
+        # same type and so does the result.
+        return l_type or r_type
+    return _compile_binary
+
+
+_COMPILERS = ExpressionTable({
+    Ren: _compile_ren,
+    IntLiteral: _literal_compiler(INT),
+    FloatingPointLiteral: _literal_compiler(FLOAT),
+    StringLiteral: _literal_compiler(STR),
+    BooleanLiteral: _literal_compiler(BOOL),
+    Print: _compile_print,
+    Sequence: _compile_sequence,
+    Program: _compile_sequence,
+    Variable: _compile_variable,
+    Assign: _compile_assign,
+    Not: _compile_not,
+    If: _compile_if,
+    While: _compile_while,
+    **{binary_operator: _binary_compiler(binary_operator) for binary_operator in _BINARY_OPCODES},
+    # Anything else.
+    object: _compile_unhandled,
+})
+
+
+def _emit_typed(op: int, code: List[Instruction], left_start: int) -> None:
+    # Emit a typed binary opcode whose operands start at left_start, or fold
+    # it into a constant when both operands are constants.
+    if len(code) == left_start + 2 and code[-2][0] == OP_CONST and code[-1][0] == OP_CONST:
+        l_val = code[-2][1]
+        r_val = code[-1][1]
+        # A division by zero must still raise when the program runs.
+        if not (op in (OP_DIV_INT, OP_DIV_FLOAT) and r_val == 0):
+            del code[-2:]
+            code.append((OP_CONST, _CONSTANT_FOLDERS[op](l_val, r_val)))
+            return
+    code.append((op, None))
+
+
+def _pure_type(expression: Expr, types: Dict[str, Type]) -> Optional[Type]:
+    # The type of an expression whose evaluation can neither raise nor
+    # change the state or print, or None for any other expression.
+    match expression:
+        case Ren() | IntLiteral() | FloatingPointLiteral() | StringLiteral() | BooleanLiteral():
+            return _LITERAL_TYPES[type(expression)]
+
+        case Variable(variable_name=variable_name):
+            return types.get(variable_name)
+
+        case Not(expr=expr):
+            return BOOL if _pure_type(expr, types) is BOOL else None
+
+        case BinaryOperator(left=left, right=right) if type(expression) in _BINARY_OPCODES:
+            l_type = _pure_type(left, types)
+            r_type = _pure_type(right, types)
+            if l_type is None or l_type is not r_type:
+                return None
+            node_type = type(expression)
+            if node_type in _COMPARISON_OPCODES:
+                return BOOL
+            if node_type in (And, Or):
+                return BOOL if l_type is BOOL else None
+            # Division can still fail on a zero divisor.
+            if node_type is not Divide and (node_type, type(l_type)) in _TYPED_OPCODES:
+                return l_type
+            return None
+
+        case _:
+            return None
+
+
+def _flatten_sequence(exprs: Tuple[Expr, ...]) -> List[Expr]:
+    """
+    Splice nested sequences into one flat list of expressions.
+
+    A nested sequence that is not last only contributes its effects, so its
+    elements can take its place. The last expression is spliced only when it
+    is non-empty, because an empty sequence evaluates to Unit.
+    """
+    flat = []
+    pending = [iter(exprs)]
+    while pending:
+        for expr in pending[-1]:
+            if isinstance(expr, (Sequence, Program)) and expr.exprs:
+                pending.append(iter(expr.exprs))
+                break
+            flat.append(expr)
+        else:
+            pending.pop()
+    # An empty nested sequence in the middle has no effect at all.
+    last = flat[-1]
+    flat = [expr for expr in flat[:-1]
+            if not (isinstance(expr, (Sequence, Program)) and not expr.exprs)]
+    flat.append(last)
+    return flat
+
+
+def _compile_discarded(expression: Expr, code: List[Instruction], types: Dict[str, Type]) -> None:
+    _COMPILERS[type(expression)](expression, code, types)
+    op, arg = code[-1]
+    # An Assign always ends with its store, and no jump inside it can land
+    # after the store, so the store can discard the value itself.
+    if type(expression) is Assign and op in _DISCARDING_STORES:
+        code[-1] = (_DISCARDING_STORES[op], arg)
+    else:
+        code.append((OP_POP, None))
+
+
+"""
+Native loops.
+
+A While loop whose condition is a comparison and whose body is a series of
+assignments, all doing integer arithmetic on variables already known to be
+Integers, is translated into an equivalent Python function that runs the
+whole loop. The function takes the loop's variables (in the order of the
+accompanying names) and returns their final values.
+"""
+
+_NATIVE_ARITHMETIC = {Add: "+", Subtract: "-", Multiply: "*"}
+_NATIVE_COMPARISON = {Lt: "<", Lte: "<=", Gt: ">", Gte: ">=", Eq: "==", Ne: "!="}
+
+
+def _native_divide(l_val: int, r_val: int) -> int:
+    try:
+        return l_val // r_val
+    except ZeroDivisionError:
+        raise InterpMathError("Division by zero") from None
+
+
+def _native_int_expr(expression: Expr, types: Dict[str, Type], names: Dict[str, str]) -> Optional[str]:
+    match expression:
+        case IntLiteral(literal=l):
+            return repr(l)
+
+        case Variable(variable_name=variable_name):
+            if types.get(variable_name) is not INT:
+                return None
+            if variable_name not in names:
+                names[variable_name] = f"v{len(names)}"
+            return names[variable_name]
+
+        case BinaryOperator(left=left, right=right) if type(expression) in (Add, Subtract, Multiply, Divide):
+            l_source = _native_int_expr(left, types, names)
+            r_source = _native_int_expr(right, types, names)
+            if l_source is None or r_source is None:
+                return None
+            if type(expression) is Divide:
+                return f"_native_divide({l_source}, {r_source})"
+            return f"({l_source} {_NATIVE_ARITHMETIC[type(expression)]} {r_source})"
+
+        case _:
+            return None
+
+
+def _native_statements(expression: Expr, types: Dict[str, Type], names: Dict[str, str], lines: List[str]) -> bool:
+    match expression:
+        case Sequence(exprs=exprs) | Program(exprs=exprs):
+            return all(_native_statements(expr, types, names, lines) for expr in exprs)
+
+        case Assign(variable=variable, value=value) if types.get(variable.variable_name) is INT:
+            value_source = _native_int_expr(value, types, names)
+            if value_source is None:
+                return False
+            target = _native_int_expr(variable, types, names)
+            lines.append(f"        {target} = {value_source}")
+            return True
+
+        case _:
+            return False
+
+
+def _try_compile_loop(loop: While, types: Dict[str, Type]) -> Optional[Tuple[Any, Tuple[str, ...]]]:
+    condition = loop.condition
+    if type(condition) not in _NATIVE_COMPARISON:
+        return None
+    names: Dict[str, str] = {}
+    l_source = _native_int_expr(condition.left, types, names)
+    r_source = _native_int_expr(condition.right, types, names)
+    if l_source is None or r_source is None:
+        return None
+    body_lines: List[str] = []
+    if not _native_statements(loop.body, types, names, body_lines):
+        return None
+
+    parameters = ", ".join(names.values())
+    lines = [
+        f"def _native_loop({parameters}):",
+        f"    while {l_source} {_NATIVE_COMPARISON[type(condition)]} {r_source}:",
+        *(body_lines or ["        pass"]),
+        "    return (" + "".join(f"{name}, " for name in names.values()) + ")",
+    ]
+    native_loop = _build_native_loop("\n".join(lines))
+    if native_loop is None:
+        return None
+    return (native_loop, tuple(names))
+
+
+# Building a native loop takes far longer than generating its source, and
+# the same loops are built again every time their program is compiled.
+@lru_cache(maxsize=128)
+def _build_native_loop(source: str) -> Optional[Callable[..., Tuple[int, ...]]]:
+    namespace: Dict[str, Any] = {"_native_divide": _native_divide}
+    try:
+        exec(source, namespace)
+    except (SyntaxError, RecursionError):
+        # Python does not compile expressions nested this deeply.
+        return None
+    return namespace["_native_loop"]
@@ -1,3 +1,5 @@
+from typing import Any, Callable, Dict
+
 from stimpl.errors import InterpSyntaxError, InterpTypeError, pretty_type
 """
 Expressions
@@ -5,6 +7,8 @@ Expressions
 
 
 class Expr(object):
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -15,6 +19,8 @@ Unit expression.
 
 
 class Ren(Expr):
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -28,6 +34,8 @@ Literal expressions.
 
 
 class Literal(Expr):
+    __slots__ = ('literal',)
+
     def __init__(self, literal):
         self.literal = literal
 
@@ -36,6 +44,8 @@ class Literal(Expr):
 
 
 class IntLiteral(Literal):
+    __slots__ = ()
+
     def __init__(self, literal):
         if type(literal) != int:
             raise InterpTypeError(
@@ -44,6 +54,8 @@ class IntLiteral(Literal):
 
 
 class FloatingPointLiteral(Literal):
+    __slots__ = ()
+
     def __init__(self, literal):
         if type(literal) != float:
             raise InterpTypeError(
@@ -52,6 +64,8 @@ class FloatingPointLiteral(Literal):
 
 
 class StringLiteral(Literal):
+    __slots__ = ()
+
     def __init__(self, literal):
         if type(literal) != str:
             raise InterpTypeError(
@@ -60,6 +74,8 @@ class StringLiteral(Literal):
 
 
 class BooleanLiteral(Literal):
+    __slots__ = ()
+
     def __init__(self, literal):
         if type(literal) != bool:
             raise InterpTypeError(
@@ -73,6 +89,8 @@ Variable Expression
 
 
 class Variable(Expr):
+    __slots__ = ('variable_name',)
+
     def __init__(self, variable_name):
         self.variable_name = variable_name
 
@@ -89,6 +107,8 @@ Operators
 
 
 class Assign(Expr):
+    __slots__ = ('variable', 'value')
+
     def __init__(self, variable, value):
         if not isinstance(variable, Variable):
             raise InterpSyntaxError("Must assign to a variable.")
@@ -100,11 +120,15 @@ class Assign(Expr):
 
 
 class UnaryOperator(Expr):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
 
 class Print(UnaryOperator):
+    __slots__ = ('to_print',)
+
     def __init__(self, to_print):
         self.to_print = to_print
         super().__init__()
@@ -114,6 +138,8 @@ class Print(UnaryOperator):
 
 
 class Not(UnaryOperator):
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr
         super().__init__()
@@ -123,6 +149,8 @@ class Not(UnaryOperator):
 
 
 class BinaryOperator(Expr):
+    __slots__ = ('left', 'right')
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
@@ -130,6 +158,8 @@ class BinaryOperator(Expr):
 
 
 class And(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -138,6 +168,8 @@ class And(BinaryOperator):
 
 
 class Or(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -146,6 +178,8 @@ class Or(BinaryOperator):
 
 
 class Lt(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -154,6 +188,8 @@ class Lt(BinaryOperator):
 
 
 class Lte(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -162,6 +198,8 @@ class Lte(BinaryOperator):
 
 
 class Gt(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -170,6 +208,8 @@ class Gt(BinaryOperator):
 
 
 class Gte(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -178,6 +218,8 @@ class Gte(BinaryOperator):
 
 
 class Eq(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -186,6 +228,8 @@ class Eq(BinaryOperator):
 
 
 class Ne(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -194,6 +238,8 @@ class Ne(BinaryOperator):
 
 
 class Add(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -202,6 +248,8 @@ class Add(BinaryOperator):
 
 
 class Subtract(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -210,6 +258,8 @@ class Subtract(BinaryOperator):
 
 
 class Multiply(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -218,6 +268,8 @@ class Multiply(BinaryOperator):
 
 
 class Divide(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -231,6 +283,8 @@ Combining forms.
 
 
 class Program(Expr):
+    __slots__ = ('exprs',)
+
     def __init__(self, *exprs):
         self.exprs = exprs
 
@@ -242,6 +296,8 @@ class Program(Expr):
 
 
 class Sequence(Expr):
+    __slots__ = ('exprs',)
+
     def __init__(self, *exprs):
         self.exprs = exprs
 
@@ -253,6 +309,8 @@ class Sequence(Expr):
 
 
 class If(Expr):
+    __slots__ = ('condition', 'true', 'false')
+
     def __init__(self, condition, true, false):
         self.condition = condition
         self.true = true
@@ -263,9 +321,36 @@ class If(Expr):
 
 
 class While(Expr):
+    __slots__ = ('condition', 'body')
+
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
 
     def __repr__(self):
         return f"while ({self.condition}) {{ {self.body} }}"
+
+
+"""
+Expression tables
+"""
+
+
+class ExpressionTable(Dict[type, Callable[..., Any]]):
+    """
+    A function for each class of expression, such as the runtime's
+    evaluators or the compiler's per-node compilers.
+
+    A class that is not in the table is handled like its nearest base class
+    that is (which is then remembered), and looking up a class without any
+    such base raises InterpSyntaxError. Since a lookup is then a single dict
+    access, the functions call each other through their table directly, so
+    each level of nesting takes a single Python frame.
+    """
+
+    def __missing__(self, expression_type: type) -> Callable[..., Any]:
+        for base in expression_type.__mro__[1:]:
+            if base in self:
+                self[expression_type] = self[base]
+                return self[base]
+        raise InterpSyntaxError("Unhandled expression type!")
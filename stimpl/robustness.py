@@ -1,8 +1,269 @@
-from stimpl.test import check_equal, check_run_result, check_program_raises
-from stimpl.runtime import run_stimpl
+import io
+from contextlib import redirect_stdout
+
+from stimpl.test import check_equal, check_run_result, check_program_raises, run_stimpl_sanity_tests
+from stimpl.runtime import run_stimpl, evaluate, EmptyState
 from stimpl.types import *
 from stimpl.expression import *
+from stimpl.errors import *
+
+
+def evaluate_program(program):
+    return evaluate(program, EmptyState())
 
 
 def run_stimpl_robustness_tests():
-    pass
+    try:
+        # A variable assigned in only one branch of an If has no
+        # statically known type afterwards.
+        program = Program(
+            Assign(Variable("c"), BooleanLiteral(True)),
+            If(Variable("c"),
+               Assign(Variable("i"), IntLiteral(1)),
+               Assign(Variable("i"), StringLiteral("one"))),
+            Add(Variable("i"), Variable("i"))
+        )
+        check_run_result((2, Integer(), None), run_stimpl(program))
+
+        program = Program(
+            Assign(Variable("c"), BooleanLiteral(False)),
+            If(Variable("c"),
+               Assign(Variable("i"), IntLiteral(1)),
+               Assign(Variable("i"), StringLiteral("one"))),
+            Add(Variable("i"), Variable("i"))
+        )
+        check_run_result(("oneone", String(), None), run_stimpl(program))
+
+        program = Program(
+            If(BooleanLiteral(False), Assign(Variable("i"), IntLiteral(1)), Ren()),
+            Assign(Variable("i"), FloatingPointLiteral(1.0)),
+            Multiply(Variable("i"), FloatingPointLiteral(2.0))
+        )
+        check_run_result((2.0, FloatingPoint(), None), run_stimpl(program))
+
+        # Assignments in a While body are not visible to the code after
+        # the loop unless the body actually ran.
+        program = Program(
+            While(BooleanLiteral(False), Assign(Variable("i"), IntLiteral(1))),
+            Variable("i")
+        )
+        check_program_raises(InterpSyntaxError(), program)
+
+        # Once a variable's type is known, a mismatched operation must
+        # still raise.
+        program = Program(
+            Assign(Variable("i"), IntLiteral(1)),
+            Add(Variable("i"), FloatingPointLiteral(1.0))
+        )
+        check_program_raises(InterpTypeError(), program)
+
+        program = Program(
+            Assign(Variable("i"), IntLiteral(1)),
+            Divide(Variable("i"), Subtract(Variable("i"), IntLiteral(1)))
+        )
+        check_program_raises(InterpMathError(), program)
+
+        # Integer-only loops run natively, but must behave exactly like
+        # interpreted ones.
+        program = Program(
+            Assign(Variable("i"), IntLiteral(0)),
+            Assign(Variable("total"), IntLiteral(0)),
+            While(Lt(Variable("i"), IntLiteral(10)),
+                  Sequence(
+                Assign(Variable("total"), Add(Variable("total"),
+                       Divide(Variable("i"), IntLiteral(2)))),
+                Assign(Variable("i"), Add(Variable("i"), IntLiteral(1))),
+            ))
+        )
+        run_value, run_type, run_state = run_stimpl(program)
+        check_equal((False, Boolean()), (run_value, run_type))
+        check_equal((10, Integer()), run_state.get_value("i"))
+        check_equal((20, Integer()), run_state.get_value("total"))
+
+        increment = Variable("i")
+        for _ in range(300):
+            increment = Add(increment, IntLiteral(0))
+        program = Program(
+            Assign(Variable("i"), IntLiteral(0)),
+            While(Lt(Variable("i"), IntLiteral(10)),
+                  Assign(Variable("i"), Add(increment, IntLiteral(1)))),
+            Variable("i")
+        )
+        check_run_result((10, Integer(), None), run_stimpl(program))
+
+        program = Program(
+            Assign(Variable("i"), IntLiteral(3)),
+            While(Gt(Variable("i"), IntLiteral(-1)),
+                  Assign(Variable("i"), Subtract(Variable("i"),
+                         Divide(Variable("i"), Variable("i")))))
+        )
+        check_program_raises(InterpMathError(), program)
+
+        # There is no short-circuit evaluation: the right operand of
+        # And/Or always has its effects and type errors.
+        program = Program(
+            And(BooleanLiteral(False), Assign(Variable("j"), BooleanLiteral(True))),
+            Variable("j")
+        )
+        check_run_result((True, Boolean(), None), run_stimpl(program))
+
+        program = Or(BooleanLiteral(True), Not(IntLiteral(1)))
+        check_program_raises(InterpTypeError(), program)
+
+        program = Or(BooleanLiteral(True), Eq(Divide(IntLiteral(1), IntLiteral(0)), IntLiteral(0)))
+        check_program_raises(InterpMathError(), program)
+
+        program = Program(
+            Assign(Variable("b"), BooleanLiteral(False)),
+            And(Variable("b"), Lt(Variable("c"), IntLiteral(1)))
+        )
+        check_program_raises(InterpSyntaxError(), program)
+
+        program = Program(
+            Assign(Variable("b"), BooleanLiteral(True)),
+            Or(Variable("b"), Eq(Variable("b"), BooleanLiteral(False)))
+        )
+        check_run_result((True, Boolean(), None), run_stimpl(program))
+
+        # Nested sequences are flattened, but a trailing empty one still
+        # evaluates to Unit.
+        program = Program(
+            Sequence(Assign(Variable("i"), IntLiteral(1)), Sequence()),
+            Sequence(Variable("i"), Sequence())
+        )
+        check_run_result((None, Unit(), None), run_stimpl(program))
+
+        # Anything that is not an expression is an error once it is
+        # reached, even as the last expression of a sequence.
+        program = Program(Assign(Variable("x"), IntLiteral(1)), None)
+        check_program_raises(InterpSyntaxError(), program)
+        check_program_raises(InterpSyntaxError(), program, evaluate_program)
+
+        # Constant operands are folded at compile time, but folding must
+        # not hide a division by zero or change the order of effects.
+        program = Divide(IntLiteral(1), Subtract(IntLiteral(2), IntLiteral(2)))
+        check_program_raises(InterpMathError(), program)
+
+        program = Program(
+            Assign(Variable("s"), Add(StringLiteral("a"), Add(StringLiteral("b"), StringLiteral("c")))),
+            Not(Lt(Multiply(FloatingPointLiteral(2.0), FloatingPointLiteral(0.5)), FloatingPointLiteral(1.0)))
+        )
+        run_value, run_type, run_state = run_stimpl(program)
+        check_equal((True, Boolean()), (run_value, run_type))
+        check_equal(("abc", String()), run_state.get_value("s"))
+
+        # Hot loops are recompiled for the types their variables have at
+        # run time, which the compiler could not know here.
+        program = Program(
+            Assign(Variable("c"), BooleanLiteral(True)),
+            If(Variable("c"),
+               Assign(Variable("i"), IntLiteral(0)),
+               Assign(Variable("i"), StringLiteral("zero"))),
+            While(Lt(Variable("i"), IntLiteral(100)),
+                  Sequence(
+                If(Eq(Variable("i"), IntLiteral(75)),
+                   Assign(Variable("j"), Variable("i")),
+                   Ren()),
+                Assign(Variable("i"), Add(Variable("i"), IntLiteral(1))),
+            )),
+            Add(Variable("i"), Variable("j"))
+        )
+        check_run_result((175, Integer(), None), run_stimpl(program))
+
+        program = Program(
+            Assign(Variable("c"), BooleanLiteral(True)),
+            If(Variable("c"),
+               Assign(Variable("i"), IntLiteral(-100)),
+               Assign(Variable("i"), StringLiteral("zero"))),
+            While(Lt(Variable("i"), IntLiteral(100)),
+                  Assign(Variable("i"), Add(Variable("i"), Divide(Variable("i"), Variable("i")))))
+        )
+        check_program_raises(InterpMathError(), program)
+
+        # Changing a program after it has run changes what it does the
+        # next time it runs.
+        program = Program(Assign(Variable("x"), IntLiteral(1)), Variable("x"))
+        check_run_result((1, Integer(), None), run_stimpl(program))
+        program.exprs[0].value = IntLiteral(42)
+        check_run_result((42, Integer(), None), run_stimpl(program))
+
+        # The reference evaluator passes the same tests as the bytecode
+        # interpreter.
+        run_stimpl_sanity_tests(evaluate_program)
+
+        # Subclasses of the built-in expressions are evaluated and
+        # compiled like the expression they extend.
+        class Plus(Add):
+            __slots__ = ()
+
+        program = Multiply(Plus(IntLiteral(1), IntLiteral(2)), IntLiteral(2))
+        check_run_result((6, Integer(), None), run_stimpl(program))
+        check_run_result((6, Integer(), None), evaluate_program(program))
+
+        class Unknown(Expr):
+            __slots__ = ()
+
+        program = Add(IntLiteral(1), Unknown())
+        check_program_raises(InterpSyntaxError(), program)
+        check_program_raises(InterpSyntaxError(), program, evaluate_program)
+
+        # An expression of an unknown type is only an error once it is
+        # reached, just as a type error is.
+        program = Program(
+            Assign(Variable("b"), BooleanLiteral(True)),
+            If(Variable("b"), IntLiteral(1), Unknown())
+        )
+        check_run_result((1, Integer(), None), run_stimpl(program))
+        check_run_result((1, Integer(), None), evaluate_program(program))
+
+        program = Program(
+            Assign(Variable("b"), BooleanLiteral(False)),
+            While(Variable("b"), Unknown()),
+            IntLiteral(7)
+        )
+        check_run_result((7, Integer(), None), run_stimpl(program))
+        check_run_result((7, Integer(), None), evaluate_program(program))
+
+        program = Program(Print(StringLiteral("hello")), Unknown())
+        for run in (run_stimpl, evaluate_program):
+            output = io.StringIO()
+            with redirect_stdout(output):
+                check_program_raises(InterpSyntaxError(), program, run)
+            check_equal("hello\n", output.getvalue())
+
+        # Ifs and sequences in tail position are followed in a loop, by
+        # both the compiler and the evaluator, so chains of them can be
+        # far longer than Python's recursion limit.
+        program = StringLiteral("end")
+        for _ in range(5000):
+            program = If(Variable("b"), StringLiteral("then"), Sequence(Ren(), program))
+        program = Program(Assign(Variable("b"), BooleanLiteral(False)), program)
+        check_run_result(("end", String(), None), run_stimpl(program))
+        check_run_result(("end", String(), None), evaluate_program(program))
+
+        # The compiler and the reference evaluator take one Python frame
+        # per level of nesting, so they handle programs nested as deep as
+        # these.
+        program = IntLiteral(0)
+        for _ in range(900):
+            program = Add(IntLiteral(1), program)
+        check_run_result((900, Integer(), None), run_stimpl(program))
+        check_run_result((900, Integer(), None), evaluate_program(program))
+
+        program = BooleanLiteral(True)
+        for _ in range(900):
+            program = Not(program)
+        check_run_result((True, Boolean(), None), run_stimpl(program))
+        check_run_result((True, Boolean(), None), evaluate_program(program))
+
+        program = IntLiteral(0)
+        for _ in range(450):
+            program = Add(IntLiteral(1), If(Variable("b"), program, IntLiteral(0)))
+        program = Program(Assign(Variable("b"), BooleanLiteral(True)), program)
+        check_run_result((450, Integer(), None), run_stimpl(program))
+        check_run_result((450, Integer(), None), evaluate_program(program))
+
+    except Exception as e:
+        raise e
+
+    print("All (robustness) tests ran successfully!")
@@ -1,49 +1,72 @@
-from typing import Any, Tuple, Optional
+import operator
+import sys
+from typing import Any, Callable, Dict, List, Tuple, Optional, Union
 
 from stimpl.expression import (
-    Expr, Program, Sequence, Assign, Variable, Ren, Print,
+    Expr, BinaryOperator, Program, Sequence, Assign, Variable, Ren, Print,
     IntLiteral, FloatingPointLiteral, StringLiteral, BooleanLiteral,
     Add, Subtract, Multiply, Divide,
     And, Or, Not,
     Lt, Lte, Gt, Gte, Eq, Ne,
-    If, While
+    If, While, ExpressionTable
 )
-from stimpl.types import Integer, FloatingPoint, String, Boolean, Unit, Type
+from stimpl.types import Integer, FloatingPoint, String, Boolean, Unit, Type, INT, FLOAT, STR, BOOL, UNIT
 from stimpl.errors import InterpTypeError, InterpSyntaxError, InterpMathError
+from stimpl.compiler import (
+    compile_expr, specialize_loop, Code, LoopSite, HOT_LOOP_THRESHOLD, NUM_OPCODES,
+    OP_CONST, OP_POP, OP_LOAD_VAR, OP_STORE_VAR, OP_PRINT,
+    OP_ADD, OP_SUB, OP_MUL, OP_DIV,
+    OP_AND, OP_OR, OP_NOT,
+    OP_LT, OP_LTE, OP_GT, OP_GTE, OP_EQ, OP_NE,
+    OP_JUMP, OP_JUMP_IF_FALSE,
+    OP_ADD_INT, OP_ADD_FLOAT, OP_ADD_STR, OP_SUB_INT, OP_SUB_FLOAT,
+    OP_MUL_INT, OP_MUL_FLOAT, OP_DIV_INT, OP_DIV_FLOAT,
+    OP_LT_TYPED, OP_LTE_TYPED, OP_GT_TYPED, OP_GTE_TYPED, OP_EQ_TYPED, OP_NE_TYPED,
+    OP_LOOP, OP_NATIVE_LOOP, OP_STORE_VAR_TYPED,
+    OP_STORE_VAR_POP, OP_STORE_VAR_TYPED_POP,
+    OP_NOT_BOOL, OP_AND_BOOL, OP_OR_BOOL, OP_JUMP_IF_FALSE_BOOL,
+    OP_JUMP_IF_FALSE_OR_POP, OP_JUMP_IF_TRUE_OR_POP, OP_UNHANDLED
+)
+
+
+_ADDABLE_TYPES = frozenset((Integer, FloatingPoint, String))
+_NUMERIC_TYPES = frozenset((Integer, FloatingPoint))
+_ORDERED_TYPES = frozenset((Integer, FloatingPoint, String, Boolean))
+_ADDABLE_VALUES = frozenset((int, float, str))
+_NUMERIC_VALUES = frozenset((int, float))
 
 
 class State(object):
-    def __init__(self, variable_name=None, variable_value=None, variable_type=None, next_state=None):
-        self.variable_name = variable_name
-        self.value = (variable_value, variable_type)
-        self.next_state = next_state
+    """
+    Variable bindings, keyed by variable name.
 
-    def copy(self) -> 'State':
-        variable_value, variable_type = self.value
-        return State(self.variable_name, variable_value, variable_type, self.next_state)
+    A State is never modified once created: set_value returns a new State
+    holding a copy of the bindings, so earlier states stay valid and a
+    State can be shared freely instead of copied.
+    """
+    __slots__ = ('variables',)
+
+    def __init__(self, variables: Optional[Dict[str, Tuple[Any, Type]]] = None):
+        self.variables = variables if variables is not None else {}
 
     def set_value(self, variable_name: str, variable_value: Any, variable_type: Type):
-        return State(variable_name, variable_value, variable_type, self)
+        variables = self.variables.copy()
+        variables[variable_name] = (variable_value, variable_type)
+        return State(variables)
 
     def get_value(self, variable_name: str) -> Any:
-        state = self
-        while state is not None:
-            if state.variable_name == variable_name:
-                return state.value
-            state = state.next_state
-        return None
+        return self.variables.get(variable_name)
 
     def __repr__(self) -> str:
-        return f"{self.variable_name}: {self.value}, " + repr(self.next_state)
+        return "".join(f"{variable_name}: {value}, " for variable_name, value in self.variables.items())
 
 
 class EmptyState(State):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
-    def copy(self) -> 'EmptyState':
-        return EmptyState()
-
     def get_value(self, variable_name: str) -> None:
         return None
 
@@ -51,191 +74,654 @@ class EmptyState(State):
         return ""
 
 
+def _eval_ren(expression: Ren, state: State) -> Tuple[Optional[Any], Type, State]:
+    return (None, UNIT, state)
+
+
+def _eval_int_literal(expression: IntLiteral, state: State) -> Tuple[Optional[Any], Type, State]:
+    return (expression.literal, INT, state)
+
+
+def _eval_floating_point_literal(expression: FloatingPointLiteral, state: State) -> Tuple[Optional[Any], Type, State]:
+    return (expression.literal, FLOAT, state)
+
+
+def _eval_string_literal(expression: StringLiteral, state: State) -> Tuple[Optional[Any], Type, State]:
+    return (expression.literal, STR, state)
+
+
+def _eval_boolean_literal(expression: BooleanLiteral, state: State) -> Tuple[Optional[Any], Type, State]:
+    return (expression.literal, BOOL, state)
+
+
+def _eval_print(expression: Print, state: State) -> Tuple[Optional[Any], Type, State]:
+    to_print = expression.to_print
+    value, typ, new_state = _EVALUATORS[type(to_print)](to_print, state)
+    sys.stdout.write(f"{value}\n")
+    return (value, typ, new_state)
+
+
+def _eval_variable(expression: Variable, state: State) -> Tuple[Optional[Any], Type, State]:
+    variable_name = expression.variable_name
+    value = state.variables.get(variable_name)
+    if value is None:
+        raise InterpSyntaxError(f"Cannot read from {variable_name} before assignment.")
+    variable_value, variable_type = value
+    return (variable_value, variable_type, state)
+
+
+def _eval_assign(expression: Assign, state: State) -> Tuple[Optional[Any], Type, State]:
+    variable = expression.variable
+    value = expression.value
+    value_result, value_type, new_state = _EVALUATORS[type(value)](value, state)
+    current_value = new_state.variables.get(variable.variable_name)
+    _, variable_type = current_value if current_value else (None, None)
+    if variable_type is not None and value_type is not variable_type:
+        raise InterpTypeError(f"Mismatched types for Assignment: Cannot assign {value_type} to {variable_type}")
+    updated_state = new_state.set_value(variable.variable_name, value_result, value_type)
+    return (value_result, value_type, updated_state)
+
+
+def _eval_add(expression: Add, state: State) -> Tuple[Optional[Any], Type, State]:
+    left = expression.left
+    right = expression.right
+    l_val, l_type, s1 = _EVALUATORS[type(left)](left, state)
+    r_val, r_type, s2 = _EVALUATORS[type(right)](right, s1)
+    if l_type is not r_type:
+        raise InterpTypeError(f"Cannot add {l_type} to {r_type}")
+    if type(l_type) in _ADDABLE_TYPES:
+        return (l_val + r_val, l_type, s2)
+    raise InterpTypeError(f"Cannot add {l_type} types")
+
+
+def _eval_subtract(expression: Subtract, state: State) -> Tuple[Optional[Any], Type, State]:
+    left = expression.left
+    right = expression.right
+    l_val, l_type, s1 = _EVALUATORS[type(left)](left, state)
+    r_val, r_type, s2 = _EVALUATORS[type(right)](right, s1)
+    if l_type is not r_type or type(l_type) not in _NUMERIC_TYPES:
+        raise InterpTypeError(f"Cannot subtract {r_type} from {l_type}")
+    return (l_val - r_val, l_type, s2)
+
+
+def _eval_multiply(expression: Multiply, state: State) -> Tuple[Optional[Any], Type, State]:
+    left = expression.left
+    right = expression.right
+    l_val, l_type, s1 = _EVALUATORS[type(left)](left, state)
+    r_val, r_type, s2 = _EVALUATORS[type(right)](right, s1)
+    if l_type is not r_type or type(l_type) not in _NUMERIC_TYPES:
+        raise InterpTypeError(f"Cannot multiply {l_type} and {r_type}")
+    return (l_val * r_val, l_type, s2)
+
+
+def _eval_divide(expression: Divide, state: State) -> Tuple[Optional[Any], Type, State]:
+    left = expression.left
+    right = expression.right
+    l_val, l_type, s1 = _EVALUATORS[type(left)](left, state)
+    r_val, r_type, s2 = _EVALUATORS[type(right)](right, s1)
+    if l_type is not r_type or type(l_type) not in _NUMERIC_TYPES:
+        raise InterpTypeError(f"Cannot divide {l_type} by {r_type}")
+    if r_val == 0:
+        raise InterpMathError("Division by zero")
+    if type(l_type) is Integer:
+        return (l_val // r_val, l_type, s2)
+    return (l_val / r_val, l_type, s2)
+
+
+def _eval_and(expression: And, state: State) -> Tuple[Optional[Any], Type, State]:
+    left = expression.left
+    right = expression.right
+    l_val, l_type, s1 = _EVALUATORS[type(left)](left, state)
+    r_val, r_type, s2 = _EVALUATORS[type(right)](right, s1)
+    if l_type is not r_type or l_type is not BOOL:
+        raise InterpTypeError(f"Cannot perform logical AND on {l_type} and {r_type}")
+    return (l_val and r_val, l_type, s2)
+
+
+def _eval_or(expression: Or, state: State) -> Tuple[Optional[Any], Type, State]:
+    left = expression.left
+    right = expression.right
+    l_val, l_type, s1 = _EVALUATORS[type(left)](left, state)
+    r_val, r_type, s2 = _EVALUATORS[type(right)](right, s1)
+    if l_type is not r_type or l_type is not BOOL:
+        raise InterpTypeError(f"Cannot perform logical OR on {l_type} and {r_type}")
+    return (l_val or r_val, l_type, s2)
+
+
+def _eval_not(expression: Not, state: State) -> Tuple[Optional[Any], Type, State]:
+    expr = expression.expr
+    val, typ, new_state = _EVALUATORS[type(expr)](expr, state)
+    if typ is not BOOL:
+        raise InterpTypeError(f"Cannot perform NOT on {typ}")
+    return (not val, typ, new_state)
+
+
+def _relational_evaluator(name: str, symbol: str, compare: Callable[[Any, Any], bool], unit_result: bool):
+    def _eval_relational(expression: BinaryOperator, state: State) -> Tuple[Optional[Any], Type, State]:
+        left = expression.left
+        right = expression.right
+        l_val, l_type, s1 = _EVALUATORS[type(left)](left, state)
+        r_val, r_type, s2 = _EVALUATORS[type(right)](right, s1)
+        if l_type is not r_type:
+            raise InterpTypeError(f"Mismatched types for {name}: {l_type}, {r_type}")
+        if type(l_type) in _ORDERED_TYPES:
+            return (compare(l_val, r_val), BOOL, s2)
+        if type(l_type) is Unit:
+            return (unit_result, BOOL, s2)
+        raise InterpTypeError(f"Cannot perform {symbol} on {l_type}")
+    return _eval_relational
+
+
+_eval_lt = _relational_evaluator("Lt", "<", operator.lt, False)
+_eval_lte = _relational_evaluator("Lte", "<=", operator.le, True)
+_eval_gt = _relational_evaluator("Gt", ">", operator.gt, False)
+_eval_gte = _relational_evaluator("Gte", ">=", operator.ge, True)
+
+
+def _eval_eq(expression: Eq, state: State) -> Tuple[Optional[Any], Type, State]:
+    left = expression.left
+    right = expression.right
+    l_val, l_type, s1 = _EVALUATORS[type(left)](left, state)
+    r_val, r_type, s2 = _EVALUATORS[type(right)](right, s1)
+    if l_type is not r_type:
+        raise InterpTypeError(f"Mismatched types for Eq: {l_type}, {r_type}")
+    return (l_val == r_val, BOOL, s2)
+
+
+def _eval_ne(expression: Ne, state: State) -> Tuple[Optional[Any], Type, State]:
+    left = expression.left
+    right = expression.right
+    l_val, l_type, s1 = _EVALUATORS[type(left)](left, state)
+    r_val, r_type, s2 = _EVALUATORS[type(right)](right, s1)
+    if l_type is not r_type:
+        raise InterpTypeError(f"Mismatched types for Ne: {l_type}, {r_type}")
+    return (l_val != r_val, BOOL, s2)
+
+
+def _eval_while(expression: While, state: State) -> Tuple[Optional[Any], Type, State]:
+    condition = expression.condition
+    body = expression.body
+    evaluate_condition = _EVALUATORS[type(condition)]
+    current_state = state
+    cond_val, cond_type, current_state = evaluate_condition(condition, current_state)
+    if cond_type is not BOOL:
+        raise InterpTypeError("While loop condition must be boolean")
+    if cond_val:
+        # Only now is the body reached.
+        evaluate_body = _EVALUATORS[type(body)]
+    while cond_val:
+        _, _, current_state = evaluate_body(body, current_state)
+        cond_val, cond_type, current_state = evaluate_condition(condition, current_state)
+    return (False, BOOL, current_state)
+
+
+"""
+Tail positions.
+
+If and Sequence evaluate to the result of another expression: the branch
+that is taken, or the last expression of the sequence. Each of them is
+evaluated one step at a time, up to that expression, and _eval_tail follows
+chains of such steps in a loop instead of recursing, so they are not limited
+by Python's recursion limit.
+"""
+
+_EMPTY_SEQUENCE_RESULT = Ren()
+
+
+def _step_if(expression: If, state: State) -> Tuple[Expr, State]:
+    condition = expression.condition
+    cond_val, cond_type, new_state = _EVALUATORS[type(condition)](condition, state)
+    if cond_type is not BOOL:
+        raise InterpTypeError(f"Condition must be boolean, got {cond_type}")
+    branch = expression.true if cond_val else expression.false
+    return (branch, new_state)
+
+
+def _step_sequence(expression: Union[Sequence, Program], state: State) -> Tuple[Expr, State]:
+    exprs = expression.exprs
+    if len(exprs) == 0:
+        return (_EMPTY_SEQUENCE_RESULT, state)
+    evaluators = _EVALUATORS
+    current_state = state
+    for expr in exprs[:-1]:
+        _, _, current_state = evaluators[type(expr)](expr, current_state)
+    return (exprs[-1], current_state)
+
+
+def _eval_tail(expression: Expr, state: State) -> Tuple[Optional[Any], Type, State]:
+    evaluators = _EVALUATORS
+    while True:
+        if isinstance(expression, If):
+            expression, state = _step_if(expression, state)
+        elif isinstance(expression, (Sequence, Program)):
+            expression, state = _step_sequence(expression, state)
+        evaluator = evaluators[type(expression)]
+        if evaluator is not _eval_tail:
+            return evaluator(expression, state)
+
+
+_EVALUATORS = ExpressionTable({
+    Ren: _eval_ren,
+    IntLiteral: _eval_int_literal,
+    FloatingPointLiteral: _eval_floating_point_literal,
+    StringLiteral: _eval_string_literal,
+    BooleanLiteral: _eval_boolean_literal,
+    Print: _eval_print,
+    Sequence: _eval_tail,
+    Program: _eval_tail,
+    Variable: _eval_variable,
+    Assign: _eval_assign,
+    Add: _eval_add,
+    Subtract: _eval_subtract,
+    Multiply: _eval_multiply,
+    Divide: _eval_divide,
+    And: _eval_and,
+    Or: _eval_or,
+    Not: _eval_not,
+    If: _eval_tail,
+    Lt: _eval_lt,
+    Lte: _eval_lte,
+    Gt: _eval_gt,
+    Gte: _eval_gte,
+    Eq: _eval_eq,
+    Ne: _eval_ne,
+    While: _eval_while,
+})
+
+
 def evaluate(expression: Expr, state: State) -> Tuple[Optional[Any], Type, State]:
-    match expression:
-        case Ren():
-            return (None, Unit(), state)
-
-        case IntLiteral(literal=l):
-            return (l, Integer(), state)
-
-        case FloatingPointLiteral(literal=l):
-            return (l, FloatingPoint(), state)
-
-        case StringLiteral(literal=l):
-            return (l, String(), state)
-
-        case BooleanLiteral(literal=l):
-            return (l, Boolean(), state)
-
-        case Print(to_print=to_print):
-            value, typ, new_state = evaluate(to_print, state)
-            if isinstance(value, Unit):
-                print("Unit")
-            else:
-                print(value)
-            return (value, typ, new_state)
-
-        case Sequence(exprs=exprs) | Program(exprs=exprs):
-            current_state = state
-            result = None
-            result_type = Unit()
-            for expr in exprs:
-                result, result_type, current_state = evaluate(expr, current_state)
-            return (result, result_type, current_state)
-
-        case Variable(variable_name=variable_name):
-            value = state.get_value(variable_name)
-            if value is None:
-                raise InterpSyntaxError(f"Cannot read from {variable_name} before assignment.")
-            variable_value, variable_type = value
-            return (variable_value, variable_type, state)
-
-        case Assign(variable=variable, value=value):
-            value_result, value_type, new_state = evaluate(value, state)
-            current_value = new_state.get_value(variable.variable_name)
-            _, variable_type = current_value if current_value else (None, None)
-            if variable_type is not None and value_type != variable_type:
-                raise InterpTypeError(f"Mismatched types for Assignment: Cannot assign {value_type} to {variable_type}")
-            updated_state = new_state.set_value(variable.variable_name, value_result, value_type)
-            return (value_result, value_type, updated_state)
-
-        case Add(left=left, right=right):
-            l_val, l_type, s1 = evaluate(left, state)
-            r_val, r_type, s2 = evaluate(right, s1)
-            if l_type != r_type:
-                raise InterpTypeError(f"Cannot add {l_type} to {r_type}")
-            if isinstance(l_type, (Integer, FloatingPoint, String)):
-                return (l_val + r_val, l_type, s2)
-            raise InterpTypeError(f"Cannot add {l_type} types")
-
-        case Subtract(left=left, right=right):
-            l_val, l_type, s1 = evaluate(left, state)
-            r_val, r_type, s2 = evaluate(right, s1)
-            if l_type != r_type or not isinstance(l_type, (Integer, FloatingPoint)):
-                raise InterpTypeError(f"Cannot subtract {r_type} from {l_type}")
-            return (l_val - r_val, l_type, s2)
-
-        case Multiply(left=left, right=right):
-            l_val, l_type, s1 = evaluate(left, state)
-            r_val, r_type, s2 = evaluate(right, s1)
-            if l_type != r_type or not isinstance(l_type, (Integer, FloatingPoint)):
-                raise InterpTypeError(f"Cannot multiply {l_type} and {r_type}")
-            return (l_val * r_val, l_type, s2)
-
-        case Divide(left=left, right=right):
-            l_val, l_type, s1 = evaluate(left, state)
-            r_val, r_type, s2 = evaluate(right, s1)
-            if l_type != r_type or not isinstance(l_type, (Integer, FloatingPoint)):
-                raise InterpTypeError(f"Cannot divide {l_type} by {r_type}")
-            if r_val == 0:
-                raise InterpMathError("Division by zero")
-            if isinstance(l_type, Integer):
-                return (l_val // r_val, l_type, s2)
-            return (l_val / r_val, l_type, s2)
-
-        case And(left=left, right=right):
-            l_val, l_type, s1 = evaluate(left, state)
-            r_val, r_type, s2 = evaluate(right, s1)
-            if l_type != r_type or not isinstance(l_type, Boolean):
-                raise InterpTypeError(f"Cannot perform logical AND on {l_type} and {r_type}")
-            return (l_val and r_val, l_type, s2)
-
-        case Or(left=left, right=right):
-            l_val, l_type, s1 = evaluate(left, state)
-            r_val, r_type, s2 = evaluate(right, s1)
-            if l_type != r_type or not isinstance(l_type, Boolean):
-                raise InterpTypeError(f"Cannot perform logical OR on {l_type} and {r_type}")
-            return (l_val or r_val, l_type, s2)
-
-        case Not(expr=expr):
-            val, typ, new_state = evaluate(expr, state)
-            if not isinstance(typ, Boolean):
-                raise InterpTypeError(f"Cannot perform NOT on {typ}")
-            return (not val, typ, new_state)
-
-        case If(condition=condition, true=true, false=false):
-            cond_val, cond_type, new_state = evaluate(condition, state)
-            if not isinstance(cond_type, Boolean):
-                raise InterpTypeError(f"Condition must be boolean, got {cond_type}")
-            branch = true if cond_val else false
-            return evaluate(branch, new_state)
-
-        case Lt(left=left, right=right):
-            l_val, l_type, s1 = evaluate(left, state)
-            r_val, r_type, s2 = evaluate(right, s1)
-            if l_type != r_type:
-                raise InterpTypeError(f"Mismatched types for Lt: {l_type}, {r_type}")
-            if isinstance(l_type, (Integer, FloatingPoint, String, Boolean)):
-                return (l_val < r_val, Boolean(), s2)
-            if isinstance(l_type, Unit):
-                return (False, Boolean(), s2)
-            raise InterpTypeError(f"Cannot perform < on {l_type}")
-
-        case Lte(left=left, right=right):
-            l_val, l_type, s1 = evaluate(left, state)
-            r_val, r_type, s2 = evaluate(right, s1)
-            if l_type != r_type:
-                raise InterpTypeError(f"Mismatched types for Lte: {l_type}, {r_type}")
-            if isinstance(l_type, (Integer, FloatingPoint, String, Boolean)):
-                return (l_val <= r_val, Boolean(), s2)
-            if isinstance(l_type, Unit):
-                return (True, Boolean(), s2)
-            raise InterpTypeError(f"Cannot perform <= on {l_type}")
-
-        case Gt(left=left, right=right):
-            l_val, l_type, s1 = evaluate(left, state)
-            r_val, r_type, s2 = evaluate(right, s1)
-            if l_type != r_type:
-                raise InterpTypeError(f"Mismatched types for Gt: {l_type}, {r_type}")
-            if isinstance(l_type, (Integer, FloatingPoint, String, Boolean)):
-                return (l_val > r_val, Boolean(), s2)
-            if isinstance(l_type, Unit):
-                return (False, Boolean(), s2)
-            raise InterpTypeError(f"Cannot perform > on {l_type}")
-
-        case Gte(left=left, right=right):
-            l_val, l_type, s1 = evaluate(left, state)
-            r_val, r_type, s2 = evaluate(right, s1)
-            if l_type != r_type:
-                raise InterpTypeError(f"Mismatched types for Gte: {l_type}, {r_type}")
-            if isinstance(l_type, (Integer, FloatingPoint, String, Boolean)):
-                return (l_val >= r_val, Boolean(), s2)
-            if isinstance(l_type, Unit):
-                return (True, Boolean(), s2)
-            raise InterpTypeError(f"Cannot perform >= on {l_type}")
-
-        case Eq(left=left, right=right):
-            l_val, l_type, s1 = evaluate(left, state)
-            r_val, r_type, s2 = evaluate(right, s1)
-            if l_type != r_type:
-                raise InterpTypeError(f"Mismatched types for Eq: {l_type}, {r_type}")
-            return (l_val == r_val, Boolean(), s2)
-
-        case Ne(left=left, right=right):
-            l_val, l_type, s1 = evaluate(left, state)
-            r_val, r_type, s2 = evaluate(right, s1)
-            if l_type != r_type:
-                raise InterpTypeError(f"Mismatched types for Ne: {l_type}, {r_type}")
-            return (l_val != r_val, Boolean(), s2)
-
-        case While(condition=condition, body=body):
-            current_state = state
-            cond_val, cond_type, current_state = evaluate(condition, current_state)
-            if not isinstance(cond_type, Boolean):
-                raise InterpTypeError("While loop condition must be boolean")
-            while cond_val:
-                _, _, current_state = evaluate(body, current_state)
-                cond_val, cond_type, current_state = evaluate(condition, current_state)
-            return (False, Boolean(), current_state)
-
-        case _:
-            raise InterpSyntaxError("Unhandled expression type!")
+    return _EVALUATORS[type(expression)](expression, state)
+
+
+"""
+Bytecode interpreter.
+
+Only values are kept on the operand stack and in the variable slots. Each
+STIMPL type is represented by exactly one Python type (Unit by None), so a
+value's STIMPL type is recovered from its Python type whenever an
+instruction has to check it.
+"""
+
+_STIMPL_TYPES: Dict[type, Type] = {
+    type(None): UNIT,
+    int: INT,
+    float: FLOAT,
+    str: STR,
+    bool: BOOL,
+}
+
+# A slot that holds no value yet. (None is the value of Unit.)
+_UNBOUND = object()
+
+
+def _type_of(value: Any) -> Type:
+    return _STIMPL_TYPES[type(value)]
+
+
+class Frame(object):
+    __slots__ = ('code', 'values', 'slot_values', 'variable_names', 'pc')
+
+    def __init__(self, code: Code, state: State):
+        self.code = code
+        self.values: List[Any] = []
+        # The values of the variables in code.variable_names, by slot.
+        variable_names = code.variable_names
+        self.slot_values: List[Any] = [_UNBOUND] * len(variable_names)
+        for slot, variable_name in enumerate(variable_names):
+            value = state.variables.get(variable_name)
+            if value is not None:
+                self.slot_values[slot] = value[0]
+        self.variable_names: Tuple[str, ...] = variable_names
+        self.pc: int = 0
+
+    def final_state(self, state: State) -> State:
+        variables = state.variables.copy()
+        for variable_name, variable_value in zip(self.variable_names, self.slot_values):
+            if variable_value is not _UNBOUND:
+                variables[variable_name] = (variable_value, _type_of(variable_value))
+        return State(variables)
+
+
+def _op_const(frame: Frame, constant: Any) -> None:
+    frame.values.append(constant)
+
+
+def _op_pop(frame: Frame, _: Any) -> None:
+    frame.values.pop()
+
+
+def _op_load_var(frame: Frame, slot: int) -> None:
+    value = frame.slot_values[slot]
+    if value is _UNBOUND:
+        raise InterpSyntaxError(f"Cannot read from {frame.variable_names[slot]} before assignment.")
+    frame.values.append(value)
+
+
+def _store(frame: Frame, slot: int, value: Any) -> None:
+    current_value = frame.slot_values[slot]
+    if current_value is not _UNBOUND and type(value) is not type(current_value):
+        raise InterpTypeError(f"Mismatched types for Assignment: Cannot assign {_type_of(value)} to {_type_of(current_value)}")
+    frame.slot_values[slot] = value
+
+
+def _op_store_var(frame: Frame, slot: int) -> None:
+    _store(frame, slot, frame.values[-1])
+
+
+def _op_store_var_typed(frame: Frame, slot: int) -> None:
+    frame.slot_values[slot] = frame.values[-1]
+
+
+def _op_store_var_pop(frame: Frame, slot: int) -> None:
+    _store(frame, slot, frame.values.pop())
+
+
+def _op_store_var_typed_pop(frame: Frame, slot: int) -> None:
+    frame.slot_values[slot] = frame.values.pop()
+
+
+def _op_print(frame: Frame, _: Any) -> None:
+    # Same output as print(), without its keyword handling. sys.stdout is
+    # looked up on every call so that redirecting it keeps working.
+    sys.stdout.write(f"{frame.values[-1]}\n")
+
+
+def _op_add(frame: Frame, _: Any) -> None:
+    values = frame.values
+    r_val = values.pop()
+    l_val = values[-1]
+    if type(l_val) is not type(r_val):
+        raise InterpTypeError(f"Cannot add {_type_of(l_val)} to {_type_of(r_val)}")
+    if type(l_val) in _ADDABLE_VALUES:
+        values[-1] = l_val + r_val
+        return
+    raise InterpTypeError(f"Cannot add {_type_of(l_val)} types")
+
+
+def _op_sub(frame: Frame, _: Any) -> None:
+    values = frame.values
+    r_val = values.pop()
+    l_val = values[-1]
+    if type(l_val) is not type(r_val) or type(l_val) not in _NUMERIC_VALUES:
+        raise InterpTypeError(f"Cannot subtract {_type_of(r_val)} from {_type_of(l_val)}")
+    values[-1] = l_val - r_val
+
+
+def _op_mul(frame: Frame, _: Any) -> None:
+    values = frame.values
+    r_val = values.pop()
+    l_val = values[-1]
+    if type(l_val) is not type(r_val) or type(l_val) not in _NUMERIC_VALUES:
+        raise InterpTypeError(f"Cannot multiply {_type_of(l_val)} and {_type_of(r_val)}")
+    values[-1] = l_val * r_val
+
+
+def _op_div(frame: Frame, _: Any) -> None:
+    values = frame.values
+    r_val = values.pop()
+    l_val = values[-1]
+    if type(l_val) is not type(r_val) or type(l_val) not in _NUMERIC_VALUES:
+        raise InterpTypeError(f"Cannot divide {_type_of(l_val)} by {_type_of(r_val)}")
+    try:
+        values[-1] = l_val // r_val if type(l_val) is int else l_val / r_val
+    except ZeroDivisionError:
+        raise InterpMathError("Division by zero") from None
+
+
+def _op_and(frame: Frame, _: Any) -> None:
+    values = frame.values
+    r_val = values.pop()
+    l_val = values[-1]
+    if type(l_val) is not bool or type(r_val) is not bool:
+        raise InterpTypeError(f"Cannot perform logical AND on {_type_of(l_val)} and {_type_of(r_val)}")
+    values[-1] = l_val and r_val
+
+
+def _op_or(frame: Frame, _: Any) -> None:
+    values = frame.values
+    r_val = values.pop()
+    l_val = values[-1]
+    if type(l_val) is not bool or type(r_val) is not bool:
+        raise InterpTypeError(f"Cannot perform logical OR on {_type_of(l_val)} and {_type_of(r_val)}")
+    values[-1] = l_val or r_val
+
+
+def _op_not(frame: Frame, _: Any) -> None:
+    value = frame.values[-1]
+    if type(value) is not bool:
+        raise InterpTypeError(f"Cannot perform NOT on {_type_of(value)}")
+    frame.values[-1] = not value
+
+
+def _relational(name: str, compare: Callable[[Any, Any], bool], unit_result: bool):
+    def _op_relational(frame: Frame, _: Any) -> None:
+        values = frame.values
+        r_val = values.pop()
+        l_val = values[-1]
+        if type(l_val) is not type(r_val):
+            raise InterpTypeError(f"Mismatched types for {name}: {_type_of(l_val)}, {_type_of(r_val)}")
+        if l_val is None:
+            values[-1] = unit_result
+        else:
+            values[-1] = compare(l_val, r_val)
+    return _op_relational
+
+
+def _equality(name: str, compare: Callable[[Any, Any], bool]):
+    def _op_equality(frame: Frame, _: Any) -> None:
+        values = frame.values
+        r_val = values.pop()
+        l_val = values[-1]
+        if type(l_val) is not type(r_val):
+            raise InterpTypeError(f"Mismatched types for {name}: {_type_of(l_val)}, {_type_of(r_val)}")
+        values[-1] = compare(l_val, r_val)
+    return _op_equality
+
+
+def _op_add_typed(frame: Frame, _: Any) -> None:
+    values = frame.values
+    r_val = values.pop()
+    values[-1] = values[-1] + r_val
+
+
+def _op_sub_typed(frame: Frame, _: Any) -> None:
+    values = frame.values
+    r_val = values.pop()
+    values[-1] = values[-1] - r_val
+
+
+def _op_mul_typed(frame: Frame, _: Any) -> None:
+    values = frame.values
+    r_val = values.pop()
+    values[-1] = values[-1] * r_val
+
+
+def _op_div_int(frame: Frame, _: Any) -> None:
+    # Python already checks for a zero divisor, so let it.
+    values = frame.values
+    r_val = values.pop()
+    try:
+        values[-1] = values[-1] // r_val
+    except ZeroDivisionError:
+        raise InterpMathError("Division by zero") from None
+
+
+def _op_div_float(frame: Frame, _: Any) -> None:
+    values = frame.values
+    r_val = values.pop()
+    try:
+        values[-1] = values[-1] / r_val
+    except ZeroDivisionError:
+        raise InterpMathError("Division by zero") from None
+
+
+def _op_not_bool(frame: Frame, _: Any) -> None:
+    frame.values[-1] = not frame.values[-1]
+
+
+def _op_and_bool(frame: Frame, _: Any) -> None:
+    values = frame.values
+    r_val = values.pop()
+    values[-1] = values[-1] and r_val
+
+
+def _op_or_bool(frame: Frame, _: Any) -> None:
+    values = frame.values
+    r_val = values.pop()
+    values[-1] = values[-1] or r_val
+
+
+def _typed_comparison(compare: Callable[[Any, Any], bool]):
+    def _op_typed_comparison(frame: Frame, _: Any) -> None:
+        values = frame.values
+        r_val = values.pop()
+        values[-1] = compare(values[-1], r_val)
+    return _op_typed_comparison
+
+
+def _op_jump(frame: Frame, target: int) -> None:
+    frame.pc = target
+
+
+def _op_jump_if_false(frame: Frame, target: int) -> None:
+    cond_val = frame.values.pop()
+    if type(cond_val) is not bool:
+        raise InterpTypeError(f"Condition must be boolean, got {_type_of(cond_val)}")
+    if not cond_val:
+        frame.pc = target
+
+
+def _op_jump_if_false_bool(frame: Frame, target: int) -> None:
+    if not frame.values.pop():
+        frame.pc = target
+
+
+def _op_unhandled(frame: Frame, _: Any) -> None:
+    raise InterpSyntaxError("Unhandled expression type!")
+
+
+def _op_loop(frame: Frame, site: LoopSite) -> None:
+    cond_val = frame.values.pop()
+    if site.check_condition and type(cond_val) is not bool:
+        raise InterpTypeError(f"Condition must be boolean, got {_type_of(cond_val)}")
+    if not cond_val:
+        return
+    site.count += 1
+    if site.count < HOT_LOOP_THRESHOLD:
+        frame.pc = site.body_start
+        return
+    site.count = 0
+    frame.pc = _specialized_entry(frame, site)
+
+
+def _specialized_entry(frame: Frame, site: LoopSite) -> int:
+    # Continue a hot loop in its version for the current variable types,
+    # compiling that version first if there is none yet.
+    if site.versions is None:
+        return site.body_start
+    key = tuple(map(type, frame.slot_values))
+    entry = site.versions.get(key)
+    if entry is None:
+        types = {variable_name: _type_of(variable_value)
+                 for variable_name, variable_value in zip(frame.variable_names, frame.slot_values)
+                 if variable_value is not _UNBOUND}
+        entry = specialize_loop(frame.code, site, types)
+        site.versions[key] = entry
+    return entry
+
+
+def _op_jump_if_false_or_pop(frame: Frame, target: int) -> None:
+    # Leaves a false condition on the stack as the result.
+    if frame.values[-1]:
+        frame.values.pop()
+    else:
+        frame.pc = target
+
+
+def _op_jump_if_true_or_pop(frame: Frame, target: int) -> None:
+    # Leaves a true condition on the stack as the result.
+    if frame.values[-1]:
+        frame.pc = target
+    else:
+        frame.values.pop()
+
+
+def _op_native_loop(frame: Frame, native_loop: Tuple[Callable[..., Tuple[int, ...]], Tuple[int, ...]]) -> None:
+    loop, slots = native_loop
+    slot_values = frame.slot_values
+    results = loop(*[slot_values[slot] for slot in slots])
+    for slot, result in zip(slots, results):
+        slot_values[slot] = result
+    frame.values.append(False)
+
+
+# Every opcode's handler is filled in below.
+_HANDLERS: List[Callable[[Frame, Any], None]] = [None] * NUM_OPCODES  # type: ignore[list-item]
+_HANDLERS[OP_CONST] = _op_const
+_HANDLERS[OP_POP] = _op_pop
+_HANDLERS[OP_LOAD_VAR] = _op_load_var
+_HANDLERS[OP_STORE_VAR] = _op_store_var
+_HANDLERS[OP_STORE_VAR_TYPED] = _op_store_var_typed
+_HANDLERS[OP_STORE_VAR_POP] = _op_store_var_pop
+_HANDLERS[OP_STORE_VAR_TYPED_POP] = _op_store_var_typed_pop
+_HANDLERS[OP_PRINT] = _op_print
+_HANDLERS[OP_ADD] = _op_add
+_HANDLERS[OP_SUB] = _op_sub
+_HANDLERS[OP_MUL] = _op_mul
+_HANDLERS[OP_DIV] = _op_div
+_HANDLERS[OP_AND] = _op_and
+_HANDLERS[OP_OR] = _op_or
+_HANDLERS[OP_NOT] = _op_not
+_HANDLERS[OP_LT] = _relational("Lt", operator.lt, False)
+_HANDLERS[OP_LTE] = _relational("Lte", operator.le, True)
+_HANDLERS[OP_GT] = _relational("Gt", operator.gt, False)
+_HANDLERS[OP_GTE] = _relational("Gte", operator.ge, True)
+_HANDLERS[OP_EQ] = _equality("Eq", operator.eq)
+_HANDLERS[OP_NE] = _equality("Ne", operator.ne)
+_HANDLERS[OP_JUMP] = _op_jump
+_HANDLERS[OP_JUMP_IF_FALSE] = _op_jump_if_false
+_HANDLERS[OP_LOOP] = _op_loop
+_HANDLERS[OP_JUMP_IF_FALSE_BOOL] = _op_jump_if_false_bool
+_HANDLERS[OP_JUMP_IF_FALSE_OR_POP] = _op_jump_if_false_or_pop
+_HANDLERS[OP_JUMP_IF_TRUE_OR_POP] = _op_jump_if_true_or_pop
+_HANDLERS[OP_UNHANDLED] = _op_unhandled
+_HANDLERS[OP_NATIVE_LOOP] = _op_native_loop
+_HANDLERS[OP_ADD_INT] = _op_add_typed
+_HANDLERS[OP_ADD_FLOAT] = _op_add_typed
+_HANDLERS[OP_ADD_STR] = _op_add_typed
+_HANDLERS[OP_SUB_INT] = _op_sub_typed
+_HANDLERS[OP_SUB_FLOAT] = _op_sub_typed
+_HANDLERS[OP_MUL_INT] = _op_mul_typed
+_HANDLERS[OP_MUL_FLOAT] = _op_mul_typed
+_HANDLERS[OP_DIV_INT] = _op_div_int
+_HANDLERS[OP_DIV_FLOAT] = _op_div_float
+_HANDLERS[OP_NOT_BOOL] = _op_not_bool
+_HANDLERS[OP_AND_BOOL] = _op_and_bool
+_HANDLERS[OP_OR_BOOL] = _op_or_bool
+_HANDLERS[OP_LT_TYPED] = _typed_comparison(operator.lt)
+_HANDLERS[OP_LTE_TYPED] = _typed_comparison(operator.le)
+_HANDLERS[OP_GT_TYPED] = _typed_comparison(operator.gt)
+_HANDLERS[OP_GTE_TYPED] = _typed_comparison(operator.ge)
+_HANDLERS[OP_EQ_TYPED] = _typed_comparison(operator.eq)
+_HANDLERS[OP_NE_TYPED] = _typed_comparison(operator.ne)
+
+
+def execute(code: Code, state: State) -> Tuple[Optional[Any], Type, State]:
+    frame = Frame(code, state)
+    instructions = code.instructions
+    handlers = _HANDLERS
+    end = code.end
+    while frame.pc != end:
+        op, arg = instructions[frame.pc]
+        frame.pc += 1
+        handlers[op](frame, arg)
+    value = frame.values.pop()
+    return (value, _type_of(value), frame.final_state(state))
 
 
 def run_stimpl(program: Expr, debug=False):
     state = EmptyState()
-    program_value, program_type, program_state = evaluate(program, state)
+    program_value, program_type, program_state = execute(compile_expr(program), state)
 
     if debug:
         print(f"program: {program}")
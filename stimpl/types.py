@@ -4,9 +4,24 @@ Types
 
 
 class Type(object):
+    def __new__(cls):
+        # Types carry no state, so every type class has exactly one instance
+        # and types can be compared by identity.
+        instance = cls.__dict__.get("_instance")
+        if instance is None:
+            instance = super().__new__(cls)
+            cls._instance = instance
+        return instance
+
     def __init__(self):
         pass
 
+    def __eq__(self, other):
+        return self is other
+
+    def __hash__(self):
+        return id(self)
+
 
 class Unit(Type):
     def __init__(self):
@@ -15,13 +30,6 @@ class Unit(Type):
     def __repr__(self):
         return "Unit"
 
-    def __eq__(self, other):
-        match other:
-            case Unit():
-                return True
-            case _:
-                return False
-
 
 class Integer(Type):
     def __init__(self):
@@ -30,13 +38,6 @@ class Integer(Type):
     def __repr__(self):
         return "Integer"
 
-    def __eq__(self, other):
-        match other:
-            case Integer():
-                return True
-            case _:
-                return False
-
 
 class FloatingPoint(Type):
     def __init__(self):
@@ -45,13 +46,6 @@ class FloatingPoint(Type):
     def __repr__(self):
         return "FloatingPoint"
 
-    def __eq__(self, other):
-        match other:
-            case FloatingPoint():
-                return True
-            case _:
-                return False
-
 
 class String(Type):
     def __init__(self):
@@ -60,13 +54,6 @@ class String(Type):
     def __repr__(self):
         return "String"
 
-    def __eq__(self, other):
-        match other:
-            case String():
-                return True
-            case _:
-                return False
-
 
 class Boolean(Type):
     def __init__(self):
@@ -75,9 +62,16 @@ class Boolean(Type):
     def __repr__(self):
         return "Boolean"
 
-    def __eq__(self, other):
-        match other:
-            case Boolean():
-                return True
-            case _:
-                return False
+
+"""
+Shared instances.
+
+Constructing a type always returns the same instance; these names just
+save the interpreter the constructor call.
+"""
+
+UNIT = Unit()
+INT = Integer()
+FLOAT = FloatingPoint()
+STR = String()
+BOOL = Boolean()